@@ -2,18 +2,30 @@ import os
 import sys
 import logging
 import json
+import gzip
+import hashlib
 import tempfile
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
 import yt_dlp
 from urllib.parse import urlparse, parse_qs
 import re
 from functools import wraps
 
+# Brotli is pinned in requirements.txt; environments without it serve gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
@@ -194,6 +206,246 @@ def get_yt_dlp_config(for_download=False):
         
     return config
 
+# Speculative extraction settings
+VIDEO_INFO_CACHE_TTL = 900  # seconds; resolved stream URLs expire after a few hours
+VIDEO_INFO_CACHE_SIZE = 100
+PREFETCH_MAX_PENDING = 8  # hints beyond this are dropped rather than queued
+FAILED_EXTRACTION_TTL = 120  # seconds to ignore prefetch hints for IDs that just failed
+
+_video_info_cache = {}  # video_id -> (fetched_at, info)
+_failed_extractions = {}  # video_id -> failed_at
+_inflight_extractions = {}  # video_id -> Future, for both prefetch and foreground work
+_pending_prefetches = set()  # queued or running prefetch futures
+_extraction_lock = threading.RLock()  # re-entrant: Future.cancel() runs done callbacks inline
+
+def _lower_thread_priority():
+    """Run prefetch workers at a lower scheduling priority than request threads"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+_prefetch_executor = ThreadPoolExecutor(
+    max_workers=2,
+    thread_name_prefix='prefetch',
+    initializer=_lower_thread_priority
+)
+
+def get_cached_video_info(video_id):
+    """Return cached extraction results for a video if they are still fresh"""
+    with _extraction_lock:
+        entry = _video_info_cache.get(video_id)
+    if entry and time.time() - entry[0] < VIDEO_INFO_CACHE_TTL:
+        return entry[1]
+    return None
+
+def _store_video_info(video_id, info):
+    """Cache extraction results, evicting the oldest entry when full"""
+    with _extraction_lock:
+        _video_info_cache[video_id] = (time.time(), info)
+        _failed_extractions.pop(video_id, None)
+        if len(_video_info_cache) > VIDEO_INFO_CACHE_SIZE:
+            oldest = min(_video_info_cache, key=lambda key: _video_info_cache[key][0])
+            del _video_info_cache[oldest]
+
+def discard_cached_video_info(video_id):
+    """Drop a cached extraction, e.g. after its stream URLs were rejected"""
+    with _extraction_lock:
+        _video_info_cache.pop(video_id, None)
+
+def _record_failed_extraction(video_id):
+    """Remember a failed extraction so repeated hints for it are skipped for a while"""
+    now = time.time()
+    with _extraction_lock:
+        for key, failed_at in list(_failed_extractions.items()):
+            if now - failed_at >= FAILED_EXTRACTION_TTL:
+                del _failed_extractions[key]
+        _failed_extractions[video_id] = now
+
+def _run_extraction(url, video_id, future):
+    """Extract video info into the given future unless it was cancelled while queued"""
+    if not future.set_running_or_notify_cancel():
+        return
+
+    try:
+        info = extract_video_info_with_retry(url)
+    except Exception as e:
+        _record_failed_extraction(video_id)
+        future.set_exception(e)
+    else:
+        if info and isinstance(info, dict):
+            _store_video_info(video_id, info)
+        future.set_result(info)
+    finally:
+        # Only clear our own marker; a foreground request may have taken this ID over
+        with _extraction_lock:
+            if _inflight_extractions.get(video_id) is future:
+                del _inflight_extractions[video_id]
+
+def prefetch_video_info(url, video_id):
+    """Queue a background extraction unless the video is cached, in flight, recently failed or the queue is full"""
+    if get_cached_video_info(video_id) is not None:
+        return 'cached'
+
+    with _extraction_lock:
+        if video_id in _inflight_extractions:
+            return 'pending'
+
+        failed_at = _failed_extractions.get(video_id)
+        if failed_at and time.time() - failed_at < FAILED_EXTRACTION_TTL:
+            return 'skipped'
+        if len(_pending_prefetches) >= PREFETCH_MAX_PENDING:
+            return 'skipped'
+
+        future = Future()
+        _inflight_extractions[video_id] = future
+        _pending_prefetches.add(future)
+
+    # Failures surface when a real request waits on the future; just log them here
+    def prefetch_done(done):
+        with _extraction_lock:
+            _pending_prefetches.discard(done)
+        if not done.cancelled() and done.exception():
+            app.logger.warning(f"Prefetch failed for {video_id}: {str(done.exception())}")
+
+    future.add_done_callback(prefetch_done)
+    _prefetch_executor.submit(_run_extraction, url, video_id, future)
+    return 'queued'
+
+def fetch_video_info(url, video_id):
+    """Get video info, reusing a cached or running extraction for the same video"""
+    info = get_cached_video_info(video_id)
+    if info is not None:
+        return info
+
+    with _extraction_lock:
+        future = _inflight_extractions.get(video_id)
+        # A prefetch still waiting for a worker would delay the click; take it over instead
+        if future is not None and future.cancel():
+            future = None
+
+        run_inline = future is None
+        if run_inline:
+            future = Future()
+            _inflight_extractions[video_id] = future
+
+    if run_inline:
+        _run_extraction(url, video_id, future)
+    return future.result()
+
+# Response optimization settings
+COMPRESS_MIN_SIZE = 500  # bytes; smaller bodies aren't worth the CPU
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/css',
+    'text/html',
+    'text/plain',
+}
+STATIC_IMMUTABLE_MAX_AGE = 31536000  # one year
+
+_asset_fingerprints = {}
+
+def asset_fingerprint(filename):
+    """Return a short content hash for a static file, or None if it is missing"""
+    # safe_join keeps lookups inside the static folder, which also bounds the cache keys
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _asset_fingerprints.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        cached = (mtime, digest)
+        _asset_fingerprints[filename] = cached
+    return cached[1]
+
+@app.template_global()
+def asset_url(filename):
+    """Build a static URL fingerprinted with the file's content hash"""
+    fingerprint = asset_fingerprint(filename)
+    if fingerprint is None:
+        return url_for('static', filename=filename)
+    return url_for('static', filename=filename, v=fingerprint)
+
+def video_etag(video):
+    """ETag for a stored video's metadata, derived from when it was last refreshed"""
+    updated_at = video.updated_at.isoformat() if video.updated_at else ''
+    return hashlib.sha1(f"{video.video_id}:{updated_at}".encode()).hexdigest()
+
+def make_conditional_response(response, etag=None, last_modified=None, max_age=None):
+    """Attach validators to a GET response and downgrade it to 304 when the client's copy is current"""
+    if etag:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    if last_modified:
+        response.last_modified = last_modified
+
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+
+    return response.make_conditional(request)
+
+@app.after_request
+def optimize_response(response):
+    """Set long-lived caching on fingerprinted assets and compress large text bodies"""
+    if request.endpoint == 'static' and response.status_code == 200:
+        filename = (request.view_args or {}).get('filename')
+        version = request.args.get('v')
+        if version and filename and version == asset_fingerprint(filename):
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+
+    if (request.method == 'HEAD'
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    if response.direct_passthrough:
+        # Only buffer small static assets; downloads stream straight from disk
+        if request.endpoint != 'static':
+            return response
+        response.direct_passthrough = False
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        body = brotli.compress(data, quality=5)  # max quality is far too slow for per-request use
+        encoding = 'br'
+    elif accepted['gzip']:
+        body = gzip.compress(data, compresslevel=6)
+        encoding = 'gzip'
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Accept-Ranges', None)
+
+    # The encoded body differs byte-for-byte, so a strong validator no longer applies
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
 # Initialize database
 with app.app_context():
     import models
@@ -216,99 +468,118 @@ def get_video_info():
         if not is_valid_youtube_url(url):
             return jsonify({'error': 'Please enter a valid YouTube URL'}), 400
         
-        # Use enhanced configuration with retry mechanism
+        # Skip extraction when the client already holds the current metadata
+        video_id = extract_video_id(url)
+        known_video = db.session.query(models.Video).filter_by(video_id=video_id).first() if video_id else None
+        if known_video and (request.if_none_match or request.if_modified_since):
+            etag = video_etag(known_video)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=known_video.updated_at):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                response.last_modified = known_video.updated_at
+                response.cache_control.no_cache = True
+                return response
+        
+        if not video_id:
+            return jsonify({'error': 'Invalid YouTube URL format.'}), 400
+        
+        # Reuse a prefetched or in-flight extraction before starting a new one
         try:
-            info = extract_video_info_with_retry(url)
+            info = fetch_video_info(url, video_id)
         except Exception as extract_error:
             app.logger.error(f"Info extraction failed after retries: {str(extract_error)}")
             return jsonify({'error': 'Could not extract video information. The video may be private, unavailable, or restricted.'}), 400
             
-            # Check if we got valid info
-            if not info or not isinstance(info, dict):
-                return jsonify({'error': 'Could not extract video information. Please check the URL and try again.'}), 400
-            
-            # Save video info to database
-            video_id = extract_video_id(url)
-            if not video_id:
-                return jsonify({'error': 'Invalid YouTube URL format.'}), 400
-                
-            video = db.session.query(models.Video).filter_by(video_id=video_id).first()
-            
-            try:
-                if not video:
-                    video = models.Video(
-                        video_id=video_id,
-                        title=info.get('title', 'Unknown Title'),
-                        uploader=info.get('uploader', 'Unknown'),
-                        duration=info.get('duration', 0),
-                        view_count=info.get('view_count', 0),
-                        thumbnail_url=info.get('thumbnail', ''),
-                        description=info.get('description', ''),
-                        upload_date=datetime.fromtimestamp(info.get('timestamp', 0)) if info.get('timestamp') else None
-                    )
-                    db.session.add(video)
-                else:
-                    # Update existing video info
-                    video.title = info.get('title', video.title)
-                    video.uploader = info.get('uploader', video.uploader)
-                    video.view_count = info.get('view_count', video.view_count)
-                    video.thumbnail_url = info.get('thumbnail', video.thumbnail_url)
-                    video.updated_at = datetime.utcnow()
-                
-                db.session.commit()
-            except Exception as db_error:
-                app.logger.error(f"Database error: {str(db_error)}")
-                db.session.rollback()
-                # Continue without database save
-            
-            # Get available formats with fallback
-            formats = []
-            seen_qualities = set()
-            
-            if 'formats' in info and info['formats']:
-                for fmt in info['formats']:
-                    if fmt.get('vcodec') != 'none' and fmt.get('height'):
-                        quality = f"{fmt['height']}p"
-                        if quality not in seen_qualities:
-                            formats.append({
-                                'format_id': fmt['format_id'],
-                                'quality': quality,
-                                'ext': fmt.get('ext', 'mp4'),
-                                'filesize': fmt.get('filesize'),
-                                'fps': fmt.get('fps')
-                            })
-                            seen_qualities.add(quality)
-            
-            # If no formats found, add common fallback options
-            if not formats:
-                fallback_formats = [
-                    {'format_id': 'best', 'quality': 'Best Available', 'ext': 'mp4', 'filesize': None, 'fps': None},
-                    {'format_id': 'worst', 'quality': 'Lowest Quality', 'ext': 'mp4', 'filesize': None, 'fps': None}
-                ]
-                formats.extend(fallback_formats)
+        # Check if we got valid info
+        if not info or not isinstance(info, dict):
+            return jsonify({'error': 'Could not extract video information. Please check the URL and try again.'}), 400
+        
+        # Save video info to database
+        video = known_video
+        saved = False
+        
+        try:
+            if not video:
+                video = models.Video(
+                    video_id=video_id,
+                    title=info.get('title', 'Unknown Title'),
+                    uploader=info.get('uploader', 'Unknown'),
+                    duration=info.get('duration', 0),
+                    view_count=info.get('view_count', 0),
+                    thumbnail_url=info.get('thumbnail', ''),
+                    description=info.get('description', ''),
+                    upload_date=datetime.fromtimestamp(info.get('timestamp', 0)) if info.get('timestamp') else None
+                )
+                db.session.add(video)
             else:
-                # Sort formats by quality (descending)
-                formats.sort(key=lambda x: int(x['quality'].replace('p', '')), reverse=True)
+                # Update existing video info; the column's onupdate only bumps updated_at
+                # (and so the ETag) when one of these values actually changed
+                video.title = info.get('title', video.title)
+                video.uploader = info.get('uploader', video.uploader)
+                video.view_count = info.get('view_count', video.view_count)
+                video.thumbnail_url = info.get('thumbnail', video.thumbnail_url)
             
-            # Add audio-only option
-            formats.append({
-                'format_id': 'bestaudio',
-                'quality': 'Audio Only (MP3)',
-                'ext': 'mp3',
-                'filesize': None,
-                'fps': None
-            })
-            
-            video_info = {
-                'title': info.get('title', 'Unknown Title'),
-                'duration': info.get('duration', 0),
-                'thumbnail': info.get('thumbnail', ''),
-                'uploader': info.get('uploader', 'Unknown'),
-                'view_count': info.get('view_count', 0),
-                'formats': formats[:10]  # Limit to top 10 formats
-            }
-            
-            return jsonify(video_info)
+            db.session.commit()
+            saved = True
+        except Exception as db_error:
+            app.logger.error(f"Database error: {str(db_error)}")
+            db.session.rollback()
+            # Continue without database save
+        
+        # Get available formats with fallback
+        formats = []
+        seen_qualities = set()
+        
+        if 'formats' in info and info['formats']:
+            for fmt in info['formats']:
+                if fmt.get('vcodec') != 'none' and fmt.get('height'):
+                    quality = f"{fmt['height']}p"
+                    if quality not in seen_qualities:
+                        formats.append({
+                            'format_id': fmt['format_id'],
+                            'quality': quality,
+                            'ext': fmt.get('ext', 'mp4'),
+                            'filesize': fmt.get('filesize'),
+                            'fps': fmt.get('fps')
+                        })
+                        seen_qualities.add(quality)
+        
+        # If no formats found, add common fallback options
+        if not formats:
+            fallback_formats = [
+                {'format_id': 'best', 'quality': 'Best Available', 'ext': 'mp4', 'filesize': None, 'fps': None},
+                {'format_id': 'worst', 'quality': 'Lowest Quality', 'ext': 'mp4', 'filesize': None, 'fps': None}
+            ]
+            formats.extend(fallback_formats)
+        else:
+            # Sort formats by quality (descending)
+            formats.sort(key=lambda x: int(x['quality'].replace('p', '')), reverse=True)
+        
+        # Add audio-only option
+        formats.append({
+            'format_id': 'bestaudio',
+            'quality': 'Audio Only (MP3)',
+            'ext': 'mp3',
+            'filesize': None,
+            'fps': None
+        })
+        
+        video_info = {
+            'title': info.get('title', 'Unknown Title'),
+            'duration': info.get('duration', 0),
+            'thumbnail': info.get('thumbnail', ''),
+            'uploader': info.get('uploader', 'Unknown'),
+            'view_count': info.get('view_count', 0),
+            'formats': formats[:10]  # Limit to top 10 formats
+        }
+        
+        response = jsonify(video_info)
+        if saved:
+            # Validators let the client revalidate with a cheap 304 instead of re-extracting
+            response.set_etag(video_etag(video))
+            response.last_modified = video.updated_at
+            response.cache_control.no_cache = True
+        return response
             
     except yt_dlp.DownloadError as e:
         error_msg = str(e)
@@ -330,6 +601,21 @@ def get_video_info():
         app.logger.error(f"Unexpected error: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred. Please try again.'}), 500
 
+@app.route('/prefetch', methods=['POST'])
+def prefetch():
+    """Start a low-priority background extraction as soon as a URL is pasted"""
+    url = request.form.get('url', '').strip()
+    
+    if not url or not is_valid_youtube_url(url):
+        return jsonify({'error': 'Please enter a valid YouTube URL'}), 400
+    
+    video_id = extract_video_id(url)
+    if not video_id:
+        return jsonify({'error': 'Invalid YouTube URL format.'}), 400
+    
+    status = prefetch_video_info(url, video_id)
+    return jsonify({'status': status, 'video_id': video_id}), 202
+
 @app.route('/download', methods=['POST'])
 def download_video():
     """Download video with specified quality"""
@@ -360,10 +646,12 @@ def download_video():
             ydl_opts['format'] = 'best'
         
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Get video info first
-            info = ydl.extract_info(url, download=False)
-            title = info.get('title', 'video')
+            # Get video info first, reusing prefetched streams when they are still fresh
             video_id = extract_video_id(url)
+            info = get_cached_video_info(video_id)
+            if info is None:
+                info = ydl.extract_info(url, download=False)
+            title = info.get('title', 'video')
             
             # Create download record
             download_record = models.Download(
@@ -378,8 +666,17 @@ def download_video():
             db.session.add(download_record)
             
             try:
-                # Download the video
-                ydl.download([url])
+                # Download from the already-resolved info instead of extracting again. Copy it so
+                # the shared cache entry is never mutated, and drop the old run's requested_* keys.
+                try:
+                    ydl.process_ie_result(ydl.sanitize_info(dict(info), remove_private_keys=True), download=True)
+                except (yt_dlp.DownloadError, yt_dlp.utils.ReExtractInfo) as stream_error:
+                    # Resolved stream URLs can expire or be rejected; fall back to a fresh extraction
+                    app.logger.warning(f"Stored stream failed for {video_id}: {str(stream_error)}. Re-extracting...")
+                    discard_cached_video_info(video_id)
+                    for leftover in os.listdir(temp_dir):
+                        os.remove(os.path.join(temp_dir, leftover))
+                    ydl.download([url])
                 
                 # Find the downloaded file
                 downloaded_files = os.listdir(temp_dir)
@@ -478,12 +775,23 @@ def api_stats():
     successful_downloads = db.session.query(models.Download).filter_by(success=True).count()
     total_videos = db.session.query(models.Video).count()
     
-    return jsonify({
+    # The snapshot version changes whenever a download is recorded or a video is refreshed
+    last_download = db.session.query(db.func.max(models.Download.download_time)).scalar()
+    last_video_update = db.session.query(db.func.max(models.Video.updated_at)).scalar()
+    last_modified = max(filter(None, [last_download, last_video_update]), default=None)
+    snapshot_version = f"{total_downloads}:{successful_downloads}:{total_videos}:{last_modified.isoformat() if last_modified else ''}"
+    
+    response = jsonify({
         'total_downloads': total_downloads,
         'successful_downloads': successful_downloads,
         'total_videos': total_videos,
         'success_rate': round((successful_downloads / total_downloads * 100) if total_downloads > 0 else 0, 2)
     })
+    return make_conditional_response(
+        response,
+        etag=hashlib.sha1(snapshot_version.encode()).hexdigest(),
+        last_modified=last_modified
+    )
 
 @app.route('/test')
 def test_video():
@@ -518,11 +826,13 @@ def api_version():
     """Get application and yt-dlp version information"""
     try:
         import yt_dlp
-        return jsonify({
+        response = jsonify({
             'app_version': '1.0.0',
             'yt_dlp_version': yt_dlp.version.__version__,
             'python_version': f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
         })
+        # Versions only change on deploy, so a short public max-age is safe
+        return make_conditional_response(response, max_age=300)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -4,6 +4,10 @@ class YouTubeDownloader {
     constructor() {
         this.selectedFormat = null;
         this.currentVideoUrl = null;
+        this.displayedVideoId = null;
+        this.prefetchTimer = null;
+        this.prefetchedIds = new Set();
+        this.fetchSequence = 0;
         this.initializeEventListeners();
     }
 
@@ -14,6 +18,11 @@ class YouTubeDownloader {
             this.fetchVideoInfo();
         });
 
+        // Hint the server to start extracting as soon as a valid URL is pasted or typed
+        document.getElementById('videoUrl').addEventListener('input', (e) => {
+            this.schedulePrefetch(e.target.value.trim());
+        });
+
         // Download button
         document.getElementById('downloadBtn').addEventListener('click', () => {
             this.downloadVideo();
@@ -35,8 +44,61 @@ class YouTubeDownloader {
     }
 
     validateYouTubeUrl(url) {
+        return this.extractVideoId(url) !== null;
+    }
+
+    extractVideoId(url) {
+        // Mirrors is_valid_youtube_url / extract_video_id on the server
         const youtubeRegex = /^(https?:\/\/)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)\/(watch\?v=|embed\/|v\/|.+\?v=)?([^&=%\?]{11})/;
-        return youtubeRegex.test(url);
+        const match = url.match(youtubeRegex);
+        return match ? match[6] : null;
+    }
+
+    schedulePrefetch(url) {
+        clearTimeout(this.prefetchTimer);
+        this.prefetchTimer = setTimeout(() => this.prefetchVideoInfo(url), 400);
+    }
+
+    prefetchVideoInfo(url) {
+        const videoId = this.extractVideoId(url);
+        if (!videoId || this.prefetchedIds.has(videoId) || this.getCachedVideoInfo(videoId)) {
+            return;
+        }
+        this.prefetchedIds.add(videoId);
+
+        const formData = new FormData();
+        formData.append('url', url);
+
+        // Best-effort hint; the real request still works if this fails
+        fetch('/prefetch', { method: 'POST', body: formData, keepalive: true })
+            .catch(error => console.debug('Prefetch hint failed:', error));
+    }
+
+    readVideoInfoCache() {
+        try {
+            return JSON.parse(sessionStorage.getItem('videoInfoCache')) || {};
+        } catch (error) {
+            return {};
+        }
+    }
+
+    getCachedVideoInfo(videoId) {
+        return this.readVideoInfoCache()[videoId] || null;
+    }
+
+    storeVideoInfo(videoId, etag, data) {
+        const cache = this.readVideoInfoCache();
+        cache[videoId] = { etag: etag, data: data, storedAt: Date.now() };
+
+        // Keep only the most recent few videos for this session
+        const ids = Object.keys(cache).sort((a, b) => cache[b].storedAt - cache[a].storedAt);
+        ids.slice(10).forEach(id => delete cache[id]);
+
+        try {
+            sessionStorage.setItem('videoInfoCache', JSON.stringify(cache));
+        } catch (error) {
+            // Storage full or disabled; caching is only an optimization
+        }
     }
 
     async fetchVideoInfo() {
@@ -56,40 +118,75 @@ class YouTubeDownloader {
             return;
         }
 
-        // Show loading state
-        fetchBtn.disabled = true;
-        fetchSpinner.classList.remove('d-none');
+        const videoId = this.extractVideoId(url);
+        const cached = this.getCachedVideoInfo(videoId);
+        // Responses for anything but the latest fetch are dropped so they can't replace it
+        const sequence = ++this.fetchSequence;
         this.hideError();
 
+        // Show a cached result immediately and revalidate it in the background
+        if (cached) {
+            this.currentVideoUrl = url;
+            this.displayVideoInfo(videoId, cached.data);
+        } else {
+            fetchBtn.disabled = true;
+            fetchSpinner.classList.remove('d-none');
+        }
+
         try {
             const formData = new FormData();
             formData.append('url', url);
 
+            const headers = {};
+            if (cached && cached.etag) {
+                headers['If-None-Match'] = cached.etag;
+            }
+
             const response = await fetch('/get_video_info', {
                 method: 'POST',
+                headers: headers,
                 body: formData
             });
 
+            if (sequence !== this.fetchSequence || (response.status === 304 && cached)) {
+                return;
+            }
+
             const data = await response.json();
+            if (sequence !== this.fetchSequence) {
+                return;
+            }
 
             if (!response.ok) {
                 throw new Error(data.error || 'Failed to fetch video information');
             }
 
+            this.storeVideoInfo(videoId, response.headers.get('ETag'), data);
+
+            // Don't re-render (and reset the page) if revalidation returned the same data
+            if (cached && JSON.stringify(cached.data) === JSON.stringify(data)) {
+                return;
+            }
+
             this.currentVideoUrl = url;
-            this.displayVideoInfo(data);
+            this.displayVideoInfo(videoId, data);
 
         } catch (error) {
             console.error('Error fetching video info:', error);
-            this.showError(error.message || 'Failed to fetch video information');
+            // Keep showing the cached result if only the revalidation failed
+            if (!cached && sequence === this.fetchSequence) {
+                this.showError(error.message || 'Failed to fetch video information');
+            }
         } finally {
-            // Hide loading state
-            fetchBtn.disabled = false;
-            fetchSpinner.classList.add('d-none');
+            // Hide loading state unless a newer fetch now owns it
+            if (sequence === this.fetchSequence) {
+                fetchBtn.disabled = false;
+                fetchSpinner.classList.add('d-none');
+            }
         }
     }
 
-    displayVideoInfo(videoData) {
+    displayVideoInfo(videoId, videoData) {
         // Update video information
         document.getElementById('videoTitle').textContent = videoData.title;
         document.getElementById('videoUploader').textContent = videoData.uploader;
@@ -97,8 +194,14 @@ class YouTubeDownloader {
         document.getElementById('videoDuration').textContent = this.formatDuration(videoData.duration);
         document.getElementById('videoViews').textContent = this.formatNumber(videoData.view_count);
 
-        // Create format options
+        // Create format options; a pick only carries over when the same video is re-rendered
         this.createFormatOptions(videoData.formats);
+        if (videoId === this.displayedVideoId) {
+            this.restoreSelectedFormat();
+        } else {
+            this.clearSelectedFormat();
+        }
+        this.displayedVideoId = videoId;
 
         // Show video info
         document.getElementById('videoInfo').classList.remove('d-none');
@@ -202,6 +305,22 @@ class YouTubeDownloader {
         document.getElementById('downloadBtn').disabled = false;
     }
 
+    restoreSelectedFormat() {
+        const selected = Array.from(document.querySelectorAll('.format-option'))
+            .find(option => option.dataset.formatId === this.selectedFormat);
+
+        if (selected) {
+            selected.classList.add('selected');
+        } else {
+            this.clearSelectedFormat();
+        }
+    }
+
+    clearSelectedFormat() {
+        this.selectedFormat = null;
+        document.getElementById('downloadBtn').disabled = true;
+    }
+
     downloadVideo() {
         if (!this.selectedFormat || !this.currentVideoUrl) {
             this.showError('Please select a format and ensure video information is loaded');